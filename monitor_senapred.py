@@ -8,27 +8,53 @@ MONITOR SENAPRED v6.1
 - Resumen diario automático
 """
 
-import argparse, json, time, os, sys, re, hashlib, csv
+import argparse, json, time, os, sys, re, hashlib, csv, logging, io, signal, select, gzip
+import urllib.request, urllib.error, queue, importlib.util
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from collections import Counter, defaultdict, deque
+from itertools import islice
 from datetime import datetime
-from dataclasses import dataclass, asdict
-from typing import List, Optional, Dict
+from dataclasses import dataclass
+from typing import List, Optional, Dict, Tuple, Union
 from pathlib import Path
+from html import escape
 
-try:
-    from selenium import webdriver
-    from selenium.webdriver.chrome.service import Service
-    from selenium.webdriver.chrome.options import Options
-    from webdriver_manager.chrome import ChromeDriverManager
-    SELENIUM_OK = True
-except ImportError:
-    SELENIUM_OK = False
+# selenium se importa recién al crear el Scraper (cargar_selenium): --help, --config y --resumen no pagan esa carga
+SELENIUM_OK = all(importlib.util.find_spec(m) for m in ('selenium', 'webdriver_manager'))
+# Hasta cargar selenium, isinstance/except con estos nombres no coinciden con nada (tupla vacía) en vez de dar NameError
+WebDriverException = TimeoutException = ()
 
 try:
-    from bs4 import BeautifulSoup
+    from bs4 import BeautifulSoup, SoupStrainer
     BS4_OK = True
 except ImportError:
     BS4_OK = False
 
+try:
+    import lxml.html
+    LXML_OK = True
+except ImportError:
+    LXML_OK = False
+
+try:
+    import ahocorasick
+    AHO_OK = True
+except ImportError:
+    AHO_OK = False
+
+try:
+    import orjson
+    ORJSON_OK = True
+except ImportError:
+    ORJSON_OK = False
+
+try:
+    import urllib3  # viene con selenium; conexiones keep-alive para las descargas HTTP
+    URLLIB3_OK = True
+except ImportError:
+    URLLIB3_OK = False
+
 try:
     from plyer import notification
     NOTIF_OK = True
@@ -36,19 +62,54 @@ except ImportError:
     NOTIF_OK = False
 
 CONFIG_DEFAULT = {
-    "general": {"intervalo_segundos": 300, "dias_antiguedad": 14, "espera_pagina": 6, "espera_detalle": 4},
+    "general": {"intervalo_segundos": 300, "dias_antiguedad": 14, "espera_pagina": 6, "espera_detalle": 4, "hilos_detalle": 8,
+                "navegadores_detalle": 3},
     "notificaciones": {"sonido_activado": True, "notificacion_escritorio": True, 
                        "modo_silencioso": {"activado": False, "hora_inicio": "23:00", "hora_fin": "07:00"}},
     "filtros": {"regiones": [], "tipos_alerta": ["roja", "amarilla", "temprana"]},
     "resumen_diario": {"activado": True, "hora_generacion": "08:00", "formato": "html"},
     "archivos": {"estado": "estado_alertas.json", "dashboard": "dashboard_senapred.html", 
-                 "datos_js": "datos_alertas.js", "log": "log_alertas.csv", "resumen": "resumen_diario"}
+                 "datos_js": "datos_alertas.js", "log": "log_alertas.csv", "resumen": "resumen_diario",
+                 "gzip": False}
 }
 
 REGIONES = ['Arica y Parinacota', 'Tarapacá', 'Antofagasta', 'Atacama', 'Coquimbo', 'Valparaíso', 
             'Metropolitana', "O'Higgins", 'Maule', 'Ñuble', 'Biobío', 'La Araucanía', 'Los Ríos', 
             'Los Lagos', 'Aysén', 'Magallanes']
 
+CAUSAS = {'incendio': 'Incendio Forestal', 'calor': 'Calor Extremo', 'temperatura': 'Altas Temperaturas',
+          'sismo': 'Sismo', 'tsunami': 'Tsunami', 'temporal': 'Temporal', 'tormenta': 'Tormenta Eléctrica',
+          'eléctrica': 'Tormenta Eléctrica', 'volcán': 'Actividad Volcánica', 'volcan': 'Actividad Volcánica',
+          'aluvión': 'Aluvión', 'inundación': 'Inundación', 'marejada': 'Marejada', 'evento masivo': 'Evento Masivo',
+          'material peligroso': 'Material Peligroso'}
+TIPOS = {'alerta roja': 'roja', 'alerta amarilla': 'amarilla', 'temprana': 'temprana', 'preventiva': 'temprana'}
+REGIONES_LC = {r.lower(): r for r in REGIONES}
+TIPO_RANK = {'roja': 0, 'amarilla': 1}  # orden de gravedad; el resto va al final
+TIPO_ICONO = {'roja': '🔴', 'amarilla': '🟡'}
+CAMBIOS_MAX = 500  # historial de cambios en memoria; el estado guarda los últimos 100
+
+# Patrones compilados una vez al importar
+FECHA_URL_RE = re.compile(r'(\d{4})-(\d{2})-(\d{2})')
+FECHA_HORA_URL_RE = re.compile(r'(\d{4})-(\d{2})-(\d{2})-(\d{2})-(\d{2})')
+COMUNA_RE = re.compile(r'comuna[s]?\s+de\s+([A-Za-záéíóúñÁÉÍÓÚÑ\s,]+?)(?:\s+por|\s+debido|,\s+por|\.)', re.I)
+# Recursos y superficie en una sola pasada: cifra seguida de la palabra que la identifica
+CIFRAS_RE = re.compile(r'(\d+(?:[.,]\d+)?)\s*(brigada|helic|hect|ha)')
+RECURSOS = {'brigada': 'brigadas', 'helic': 'helicópteros'}
+
+URL_ALERTAS = 'https://senapred.cl/alertas/'
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+URLS_BLOQUEADAS = ['*.woff*', '*.ttf', '*.otf', '*.mp4', '*.webm', '*.mp3', '*.ico', '*google-analytics.com*', '*googletagmanager.com*',
+                   '*doubleclick.net*', '*facebook.net*', '*facebook.com/tr*', '*hotjar.com*', '*clarity.ms*']
+CHARSET_RE = re.compile(r'charset=["\']?([\w.:-]+)', re.I)
+# Contenedor del contenido de la alerta (selectores CSS de descendientes), en orden de preferencia: menú,
+# navegación y pie quedan fuera, y un <article> suelto fuera de <main> (tarjeta de otra alerta) no se toma por el contenido
+CONTENEDORES = ('main article', 'main')
+XPATH_TEXTO = './/text()[not(ancestor::script) and not(ancestor::style)]'
+# Texto visible del contenedor en Chrome (o del body si no hay), para esperar a que cargue el contenido
+JS_TEXTO_ALERTA = f"return ({' || '.join(f'document.querySelector({t!r})' for t in CONTENEDORES)} || document.body).innerText;"
+# Atributos href de los enlaces de alerta, leídos del DOM en Chrome (sin serializar ni parsear page_source)
+JS_ENLACES = "return Array.from(document.querySelectorAll('a[href*=\"/alerta/\"]'), a => a.getAttribute('href'));"
+
 def cargar_config() -> dict:
     p = Path("config.json")
     if p.exists():
@@ -70,9 +131,14 @@ def cargar_config() -> dict:
 CONFIG = cargar_config()
 
 def generar_id(url: str) -> str:
-    return hashlib.md5(url.lower().strip().encode()).hexdigest()[:16]
+    return hashlib.blake2b(url.lower().strip().encode(), digest_size=8).hexdigest()
+
+HASH_V = 3  # versión de generar_id/contenido_hash en el estado guardado (1: MD5 truncado, 2: BLAKE2b, 3: texto del contenedor)
 
-@dataclass
+# __slots__ en las dataclasses cuando la versión lo permite (3.10+): sin __dict__ por instancia
+DC_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+@dataclass(**DC_SLOTS)
 class Alerta:
     id: str
     url: str
@@ -86,32 +152,135 @@ class Alerta:
     superficie: str
     contenido_hash: str
     estado_monitor: str = "activa"
-    def to_dict(self): return asdict(self)
 
-@dataclass 
+@dataclass(**DC_SLOTS)
 class Cambio:
     alerta_id: str
     tipo_cambio: str
     fecha_hora: str
     descripcion: str
 
-def log(msg: str, nivel: str = "INFO"):
-    ts = datetime.now().strftime('%H:%M:%S')
-    print(f"[{ts}] [{nivel}] {msg}")
+def nivel(record: logging.LogRecord) -> str:
+    """Nombre de nivel de la consola y del CSV: WARN como en el log histórico."""
+    return 'WARN' if record.levelno == logging.WARNING else record.levelname
+
+class CsvLogHandler(logging.Handler):
+    """Agrega cada registro como fila fecha,hora,nivel,mensaje al log CSV.
+    El archivo se abre una vez y queda abierto; logging.shutdown() lo cierra al salir."""
+    def __init__(self):
+        super().__init__()
+        self._f = None
+    
+    def emit(self, record):
+        try:
+            if self._f is None:
+                lf = CONFIG["archivos"]["log"]
+                nuevo = not Path(lf).exists()
+                self._f = open(lf, 'a', newline='', encoding='utf-8')
+                self._w = csv.writer(self._f)
+                if nuevo: self._w.writerow(['fecha', 'hora', 'nivel', 'mensaje'])
+            t = time.localtime(record.created)
+            self._w.writerow([time.strftime('%Y-%m-%d', t), time.strftime('%H:%M:%S', t), nivel(record), record.getMessage()])
+            self._f.flush()
+        except Exception: pass
+    
+    def close(self):
+        if self._f:
+            self._f.close()
+            self._f = None
+        super().close()
+
+logger = logging.getLogger("senapred")
+logger.setLevel(logging.INFO)
+logger.propagate = False
+_consola = logging.StreamHandler(sys.stdout)
+_consola.addFilter(lambda r: setattr(r, 'nivel', nivel(r)) or True)  # solo este logger muestra WARN, sin tocar el nombre global
+_consola.setFormatter(logging.Formatter('[%(asctime)s] [%(nivel)s] %(message)s', datefmt='%H:%M:%S'))
+logger.addHandler(_consola)
+logger.addHandler(CsvLogHandler())
+
+def filtrar_enlaces(hrefs) -> List[str]:
+    """URLs absolutas de detalle de alerta, sin duplicados y en orden de aparición."""
+    urls = (('https://senapred.cl' + h) if h.startswith('/') else h for h in hrefs if h and '/alerta/' in h and 'alertas' not in h)
+    return list(dict.fromkeys(u for u in urls if u.startswith('http')))
+
+def enlaces_alerta(html: str) -> List[str]:
+    """Enlaces de alerta del HTML del listado."""
+    if LXML_OK: hrefs = lxml.html.fromstring(html).xpath('//a[contains(@href, "/alerta/")]/@href', smart_strings=False)
+    else: hrefs = [l['href'] for l in BeautifulSoup(html, 'html.parser', parse_only=SoupStrainer('a', href=True)).find_all('a')]
+    return filtrar_enlaces(hrefs)
+
+def ultimos(dq, n: int) -> list:
+    """Los últimos n elementos de un deque, en orden (un deque no se puede rebanar)."""
+    return list(islice(reversed(dq), n))[::-1]
+
+def campos(o) -> dict:
+    """Dataclass plana a dict (copia superficial); asdict copiaría en profundidad campo por campo.
+    Se leen los campos por nombre porque con __slots__ no hay __dict__."""
+    return {k: getattr(o, k) for k in o.__dataclass_fields__}
+
+def escribir_json(f, obj):
+    """Escribe obj como JSON en el archivo binario f sin armar el texto completo en memoria (json.dump va por partes)."""
+    if ORJSON_OK: f.write(orjson.dumps(obj)); return
+    w = io.TextIOWrapper(f, encoding='utf-8')
+    json.dump(obj, w, ensure_ascii=False, separators=(',', ':'), default=campos)  # compacto, como orjson
+    w.detach()
+
+@contextmanager
+def abrir_atomico(ruta):
+    """Abre un .tmp para escribir y lo renombra sobre ruta al cerrar: quien lea (navegador, otro proceso) nunca ve un archivo a medias."""
+    tmp = f"{ruta}.tmp"
     try:
-        lf = CONFIG["archivos"]["log"]
-        ex = Path(lf).exists()
-        with open(lf, 'a', newline='', encoding='utf-8') as f:
-            w = csv.writer(f)
-            if not ex: w.writerow(['fecha', 'hora', 'nivel', 'mensaje'])
-            w.writerow([datetime.now().strftime('%Y-%m-%d'), ts, nivel, msg])
-    except: pass
+        with open(tmp, 'wb') as f: yield f
+        os.replace(tmp, ruta)
+    except:
+        try: os.remove(tmp)
+        except OSError: pass
+        raise
 
-def en_horario_silencioso() -> bool:
+def texto_alerta(html: str, pagina: bool = False) -> Optional[str]:
+    """Texto visible del contenedor de la alerta con los espacios normalizados, igual venga el HTML por HTTP o de Chrome.
+    None si la página no tiene contenedor; con pagina=True se usa entonces la página completa. Usa lxml si está disponible."""
+    if LXML_OK:
+        try:
+            doc = lxml.html.fromstring(html)
+            raiz = next((n[0] for t in CONTENEDORES if (n := doc.xpath('//' + '//'.join(t.split())))), doc if pagina else None)
+            return None if raiz is None else ' '.join(' '.join(raiz.xpath(XPATH_TEXTO)).split())
+        except Exception: pass
+    sopa = BeautifulSoup(html, 'html.parser')
+    raiz = next((n for t in CONTENEDORES if (n := sopa.select_one(t))), sopa if pagina else None)
+    return None if raiz is None else ' '.join(raiz.get_text(' ').split())
+
+class BuscadorClaves:
+    """Busca varias tablas de palabras clave con una sola pasada sobre el texto en minúsculas.
+    Por tabla devuelve el valor de la primera clave (en orden del dict) presente, o None.
+    Usa Aho-Corasick (pyahocorasick) si está instalado; si no, una alternación regex."""
+    def __init__(self, tablas: Dict[str, dict]):
+        self.tablas = tablas
+        self._clave = {k: (tabla, i) for tabla, claves in tablas.items() for i, k in enumerate(claves)}
+        if AHO_OK:
+            self._ac = ahocorasick.Automaton()
+            for k in self._clave: self._ac.add_word(k, k)
+            self._ac.make_automaton()
+        else:
+            self._re = re.compile('|'.join(map(re.escape, self._clave)))
+    
+    def buscar(self, t: str) -> Dict[str, Optional[str]]:
+        hits = {k for _, k in self._ac.iter(t)} if AHO_OK else set(self._re.findall(t))
+        mejor = {}
+        for k in hits:
+            tabla, i = self._clave[k]
+            if tabla not in mejor or i < mejor[tabla][0]: mejor[tabla] = (i, k)
+        return {tabla: claves[mejor[tabla][1]] if tabla in mejor else None for tabla, claves in self.tablas.items()}
+
+BUSCADOR = BuscadorClaves({'tipo': TIPOS, 'region': REGIONES_LC, 'causa': CAUSAS})
+BUSCA_TIPO = BuscadorClaves({'tipo': TIPOS})
+
+def en_horario_silencioso(ahora: datetime = None) -> bool:
     cfg = CONFIG["notificaciones"]["modo_silencioso"]
     if not cfg["activado"]: return False
     try:
-        ahora = datetime.now().time()
+        ahora = (ahora or datetime.now()).time()
         ini = datetime.strptime(cfg["hora_inicio"], "%H:%M").time()
         fin = datetime.strptime(cfg["hora_fin"], "%H:%M").time()
         return (ini <= ahora <= fin) if ini <= fin else (ahora >= ini or ahora <= fin)
@@ -133,152 +302,278 @@ def sonido(tipo: str = "nueva"):
                 winsound.Beep(f, d); time.sleep(0.1)
     except: print('\a')
 
+def limpiar_pantalla():
+    """Limpia la terminal con secuencias ANSI, sin lanzar un proceso clear/cls."""
+    if not sys.stdout.isatty(): return
+    if sys.platform == 'win32':
+        try:
+            import ctypes
+            k = ctypes.windll.kernel32; h = k.GetStdHandle(-11); modo = ctypes.c_uint32()
+            # ENABLE_VIRTUAL_TERMINAL_PROCESSING (Windows 10+)
+            if not (k.GetConsoleMode(h, ctypes.byref(modo)) and k.SetConsoleMode(h, modo.value | 0x0004)): raise OSError
+        except Exception: os.system('cls'); return
+    sys.stdout.write('\x1b[2J\x1b[H'); sys.stdout.flush()
+
+# Filtros como frozenset (vacío = sin filtro); config.json solo se lee al iniciar
+FILTRO_REGIONES = frozenset(CONFIG["filtros"]["regiones"])
+FILTRO_TIPOS = frozenset(CONFIG["filtros"]["tipos_alerta"])
+
 def filtrar_alertas(alertas: List[Alerta]) -> List[Alerta]:
-    r = alertas
-    if CONFIG["filtros"]["regiones"]: r = [a for a in r if a.region in CONFIG["filtros"]["regiones"]]
-    if CONFIG["filtros"]["tipos_alerta"]: r = [a for a in r if a.tipo in CONFIG["filtros"]["tipos_alerta"]]
-    return r
+    return [a for a in alertas if (not FILTRO_REGIONES or a.region in FILTRO_REGIONES) and (not FILTRO_TIPOS or a.tipo in FILTRO_TIPOS)]
+
+def cargar_selenium() -> bool:
+    """Importa selenium la primera vez; False si no está instalado o falla al importar (p. ej. una dependencia rota)."""
+    global SELENIUM_OK, webdriver, Service, Options, By, WebDriverWait, WebDriverException, TimeoutException, ChromeDriverManager
+    if not SELENIUM_OK or 'ChromeDriverManager' in globals(): return SELENIUM_OK
+    try:
+        from selenium import webdriver
+        from selenium.webdriver.chrome.service import Service
+        from selenium.webdriver.chrome.options import Options
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.common.exceptions import WebDriverException, TimeoutException
+        from webdriver_manager.chrome import ChromeDriverManager
+    except ImportError:
+        SELENIUM_OK = False
+    return SELENIUM_OK
 
 
 class Scraper:
+    _driver_path: Optional[str] = None  # chromedriver resuelto una sola vez por proceso
+    
     def __init__(self, dias_max: int = None):
+        cargar_selenium()
         self.dias_max = dias_max or CONFIG["general"]["dias_antiguedad"]
         self.driver = None
+        self._extra = []  # navegadores adicionales para los detalles que requieren JS
+        # url -> (ETag, Last-Modified, alerta) para GET condicional de los detalles
+        self.cache_http: Dict[str, Tuple[Optional[str], Optional[str], Optional[Alerta]]] = {}  # alerta None: no es alerta
+        self.sin_revisar = set()  # ids que en el último ciclo no se pudieron revisar (no se dan por canceladas)
+        self.listado_completo = True  # False: el listado del ciclo pudo quedar corto y no se cancela nada
+        self._n_listado: Optional[int] = None  # enlaces del último listado completo (Chrome con scroll)
+        # Pool de conexiones reutilizadas entre descargas y entre ciclos (una por hilo de detalle)
+        self._http = urllib3.PoolManager(maxsize=CONFIG["general"]["hilos_detalle"]) if URLLIB3_OK else None
+    
+    def __enter__(self): return self
+    
+    def __exit__(self, *exc): self.close()
+    
+    def close(self):
+        for d in [self.driver] + self._extra:
+            if d:
+                try: d.quit()
+                except: pass
+        self.driver, self._extra = None, []
+    
+    def _navegador(self):
+        """Reutiliza el navegador entre ciclos; lo recrea si no responde."""
+        if self.driver:
+            try:
+                self.driver.delete_all_cookies()
+                return self.driver
+            except WebDriverException:
+                logger.warning("Navegador sin respuesta, reiniciando...")
+                self.close()
+        logger.info("Iniciando navegador...")
+        self.driver = self._crear_driver()
+        return self.driver
     
     def _crear_driver(self):
         opts = Options()
-        for a in ['--headless=new', '--no-sandbox', '--disable-dev-shm-usage', '--disable-gpu', '--window-size=1920,1080', '--log-level=3']:
+        for a in ['--headless=new', '--no-sandbox', '--disable-dev-shm-usage', '--disable-gpu', '--window-size=1920,1080', '--log-level=3',
+                  '--blink-settings=imagesEnabled=false']:
             opts.add_argument(a)
-        opts.add_argument('user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36')
+        opts.add_argument(f'user-agent={USER_AGENT}')
         opts.add_experimental_option('excludeSwitches', ['enable-logging'])
-        return webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=opts)
+        # Solo interesa el texto: sin imágenes y sin esperar recursos tras DOMContentLoaded
+        opts.add_experimental_option('prefs', {'profile.managed_default_content_settings.images': 2})
+        opts.page_load_strategy = 'eager'
+        if Scraper._driver_path is None: Scraper._driver_path = ChromeDriverManager().install()
+        driver = webdriver.Chrome(service=Service(Scraper._driver_path), options=opts)
+        try:  # fuentes, multimedia y analítica no aportan texto (el CSS se deja: define qué texto es visible)
+            driver.execute_cdp_cmd('Network.enable', {})
+            driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': URLS_BLOQUEADAS})
+        except Exception: pass
+        return driver
     
     def obtener_alertas(self) -> List[Alerta]:
         try:
-            log("Iniciando navegador...")
-            self.driver = self._crear_driver()
-            urls = self._obtener_urls()
-            log(f"URLs: {len(urls)}")
-            alertas, ids = [], set()
-            for i, url in enumerate(urls):
+            urls = self._listado()
+            logger.info("URLs: %s", len(urls))
+            pendientes, ids, hoy = [], set(), datetime.now()
+            self.sin_revisar = set()
+            for url in urls:
                 aid = generar_id(url)
                 if aid in ids: continue
                 ids.add(aid)
-                m = re.search(r'(\d{4})-(\d{2})-(\d{2})', url)
+                m = FECHA_URL_RE.search(url)
                 if m:
                     try:
-                        if (datetime.now() - datetime(int(m[1]), int(m[2]), int(m[3]))).days > self.dias_max: continue
+                        if (hoy - datetime(int(m[1]), int(m[2]), int(m[3]))).days > self.dias_max: continue
                     except: pass
-                log(f"  [{i+1}/{len(urls)}] {url[-55:]}")
-                if a := self._extraer_alerta(url, aid): alertas.append(a)
-                time.sleep(0.5)
+                pendientes.append((url, aid))
+            # Detalles en paralelo vía HTTP; Selenium solo para las páginas que requieren JS
+            alertas, sin_http = [], []
+            with ThreadPoolExecutor(max_workers=CONFIG["general"]["hilos_detalle"]) as pool:
+                for i, ((url, aid), a) in enumerate(zip(pendientes, pool.map(lambda p: self._extraer_http(*p), pendientes))):
+                    logger.info("  [%s/%s] %s", i + 1, len(pendientes), url[-55:])
+                    if a: alertas.append(a)
+                    elif a is None: sin_http.append((url, aid))  # False: ya se sabe que no es alerta
+            vigentes = {url for url, _ in pendientes}
+            self.cache_http = {u: c for u, c in self.cache_http.items() if u in vigentes}
+            if sin_http:
+                logger.info("Selenium: %s páginas", len(sin_http))
+                try: res = self._extraer_selenium(sin_http)
+                except Exception as e:  # sin Chrome se conservan las alertas obtenidas por HTTP
+                    logger.error("Selenium: %s", e)
+                    self.close()
+                    res = [None] * len(sin_http)
+                for (url, aid), a in zip(sin_http, res):
+                    if a: alertas.append(a)
+                    elif a is None: self.sin_revisar.add(aid)
+                    # La caché negativa provisoria de _extraer_http solo queda si Chrome tampoco encontró alerta
+                    if a is not False and (c := self.cache_http.get(url)) and c[2] is None: del self.cache_http[url]
             alertas = filtrar_alertas(alertas)
-            log(f"Total: {len(alertas)}")
+            logger.info("Total: %s", len(alertas))
             return alertas
-        except Exception as e: log(f"Error: {e}", "ERROR"); return []
-        finally:
-            if self.driver:
-                try: self.driver.quit()
+        except Exception as e:
+            logger.error("Error: %s", e)
+            if isinstance(e, WebDriverException): self.close()
+            return []
+    
+    def _extraer_selenium(self, pendientes: List[Tuple[str, str]]) -> list:
+        """Reparte las páginas entre varios navegadores (el principal más los adicionales).
+        Devuelve un resultado por página, en orden: Alerta, False (no es alerta) o None (no se pudo revisar)."""
+        n = max(1, min(CONFIG["general"]["navegadores_detalle"], len(pendientes)))
+        self._navegador()
+        vivos = []
+        for d in self._extra:
+            try: d.delete_all_cookies(); vivos.append(d)
+            except WebDriverException:
+                try: d.quit()
                 except: pass
+        self._extra = vivos
+        while len(self._extra) < n - 1: self._extra.append(self._crear_driver())
+        libres = queue.Queue()
+        for d in [self.driver] + self._extra[:n - 1]: libres.put(d)
+        
+        def tarea(p):
+            d = libres.get()
+            try: return self._extraer_alerta(*p, d)
+            finally: libres.put(d)
+        
+        with ThreadPoolExecutor(max_workers=n) as pool:
+            return list(pool.map(tarea, pendientes))
+    
+    def _esperar(self, segundos: float, condicion, driver=None) -> bool:
+        """Espera hasta que se cumpla la condición (máximo `segundos`) en lugar de un sleep fijo."""
+        try:
+            WebDriverWait(driver or self.driver, segundos, poll_frequency=0.2).until(condicion)
+            return True
+        except TimeoutException: return False
+    
+    def _get(self, url: str, headers: Dict[str, str] = None) -> Tuple[int, str, dict]:
+        """GET de una página como texto; devuelve (estado, html, cabeceras). Con urllib3 reutiliza conexiones."""
+        h = {'User-Agent': USER_AGENT, **(headers or {})}
+        if self._http:
+            r = self._http.request('GET', url, headers=h, timeout=15, retries=urllib3.Retry(total=5, connect=0, read=0))
+            m = CHARSET_RE.search(r.headers.get('Content-Type', ''))
+            return r.status, r.data.decode(m[1] if m else 'utf-8', 'replace'), r.headers
+        try:
+            with urllib.request.urlopen(urllib.request.Request(url, headers=h), timeout=15) as r:
+                return r.status, r.read().decode(r.headers.get_content_charset() or 'utf-8', 'replace'), r.headers
+        except urllib.error.HTTPError as e: return e.code, '', e.headers
+    
+    def _listado(self) -> List[str]:
+        """El HTML del listado solo trae la primera tanda (el resto se carga con scroll). Se usa si tiene al menos
+        tantos enlaces como el último listado completo de Chrome; si no, se recorre con Chrome. Si Chrome no está
+        o falla, queda el listado HTTP marcado como incompleto."""
+        urls = self._obtener_urls_http()
+        if self._n_listado is not None and len(urls) >= self._n_listado:
+            self.listado_completo = True
+            return urls
+        completas = self._obtener_urls() if SELENIUM_OK else []
+        if completas: self._n_listado = len(completas)
+        self.listado_completo = bool(completas)
+        return completas or urls
+    
+    def _obtener_urls_http(self) -> List[str]:
+        try:
+            estado, html, _ = self._get(URL_ALERTAS)
+            if estado != 200: raise ValueError(f"HTTP {estado}")
+            return enlaces_alerta(html)
+        except Exception as e: logger.warning("Listado HTTP: %s", e); return []
     
     def _obtener_urls(self) -> List[str]:
         urls = []
         try:
-            self.driver.get('https://senapred.cl/alertas/')
-            time.sleep(CONFIG["general"]["espera_pagina"])
+            self._navegador().get(URL_ALERTAS)
+            n_links = lambda d: d.execute_script('return document.querySelectorAll(\'a[href*="/alerta/"]\').length;')
+            self._esperar(CONFIG["general"]["espera_pagina"], lambda d: n_links(d) > 0)
             for _ in range(3):
+                n = n_links(self.driver)
                 self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                time.sleep(1)
-            for l in BeautifulSoup(self.driver.page_source, 'html.parser').find_all('a', href=True):
-                h = l['href']
-                if '/alerta/' in h and 'alertas' not in h:
-                    u = ('https://senapred.cl' + h) if h.startswith('/') else h
-                    if u.startswith('http') and u not in urls: urls.append(u)
-        except Exception as e: log(f"Error URLs: {e}", "ERROR")
+                if not self._esperar(1, lambda d: n_links(d) > n): break
+            urls = filtrar_enlaces(self.driver.execute_script(JS_ENLACES) or [])
+        except Exception as e: logger.error("Error URLs: %s", e)
         return urls
     
-    def _extraer_alerta(self, url: str, aid: str) -> Optional[Alerta]:
+    def _extraer_http(self, url: str, aid: str) -> Union[Alerta, bool, None]:
+        """Alerta; False si ya se sabe que la página no es una alerta; None si hay que abrirla con Chrome."""
+        cache = self.cache_http.get(url)
+        headers = {}
+        if cache and cache[0]: headers['If-None-Match'] = cache[0]
+        if cache and cache[1]: headers['If-Modified-Since'] = cache[1]
+        try: estado, html, rh = self._get(url, headers)
+        except Exception: return None
+        if estado == 304: return (cache[2] or False) if cache else None  # alerta None: caché negativa
+        if estado != 200: return None
+        etag, modificado = rh.get('ETag'), rh.get('Last-Modified')
+        a = self._parsear_alerta(url, aid, html)
+        # Texto sin tipo en el HTML: caché negativa provisoria, obtener_alertas la confirma tras revisar con Chrome.
+        # Un shell JS vacío da None y nunca queda en caché, así un timeout de Chrome no esconde la alerta para siempre
+        if a is not None and (etag or modificado): self.cache_http[url] = (etag, modificado, a or None)
+        return a or None
+    
+    def _extraer_alerta(self, url: str, aid: str, driver) -> Union[Alerta, bool, None]:
         try:
-            self.driver.get(url)
-            time.sleep(CONFIG["general"]["espera_detalle"])
-            txt = BeautifulSoup(self.driver.page_source, 'html.parser').get_text(' ', strip=True)
+            driver.get(url)
+            self._esperar(CONFIG["general"]["espera_detalle"],
+                          lambda d: BUSCA_TIPO.buscar(d.execute_script(JS_TEXTO_ALERTA).lower())['tipo'], driver)
+            html = driver.page_source
+        except Exception as e: logger.warning("    ✗ %s", e); return None
+        return self._parsear_alerta(url, aid, html, pagina=True)
+    
+    def _parsear_alerta(self, url: str, aid: str, html: str, pagina: bool = False) -> Union[Alerta, bool, None]:
+        """Solo mira el contenedor de la alerta; sin él o vacío, None (Chrome la revisa) salvo con pagina=True."""
+        try:
+            txt = texto_alerta(html, pagina)
+            # Contenedor vacío por HTTP: shell JS que se rellena en el navegador, no se puede dar por no-alerta
+            if txt is None or not (txt or pagina): return None
             t = txt.lower()
-            tipo = 'roja' if 'alerta roja' in t else ('amarilla' if 'alerta amarilla' in t else ('temprana' if 'temprana' in t or 'preventiva' in t else None))
-            if not tipo: return None
-            m = re.search(r'(\d{4})-(\d{2})-(\d{2})-(\d{2})-(\d{2})', url)
+            claves = BUSCADOR.buscar(t)
+            tipo = claves['tipo']
+            if not tipo: return False  # la página no es una alerta (o su contenido requiere JS)
+            m = FECHA_HORA_URL_RE.search(url)
             fecha = f"{m[3]}/{m[2]}/{m[1]}" if m else datetime.now().strftime("%d/%m/%Y")
             hora = f"{m[4]}:{m[5]}" if m else "--:--"
-            region = next((r for r in REGIONES if r.lower() in t), "No especificada")
-            mc = re.search(r'comuna[s]?\s+de\s+([A-Za-záéíóúñÁÉÍÓÚÑ\s,]+?)(?:\s+por|\s+debido|,\s+por|\.)', txt, re.I)
-            comuna = mc[1].strip().title()[:50] if mc else "No especificada"
-            causas = {'incendio': 'Incendio Forestal', 'calor': 'Calor Extremo', 'temperatura': 'Altas Temperaturas',
-                      'sismo': 'Sismo', 'tsunami': 'Tsunami', 'temporal': 'Temporal', 'tormenta': 'Tormenta Eléctrica',
-                      'eléctrica': 'Tormenta Eléctrica', 'volcán': 'Actividad Volcánica', 'volcan': 'Actividad Volcánica',
-                      'aluvión': 'Aluvión', 'inundación': 'Inundación', 'marejada': 'Marejada', 'evento masivo': 'Evento Masivo',
-                      'material peligroso': 'Material Peligroso'}
-            causa = next((v for k, v in causas.items() if k in t), "Emergencia")
-            rec = []
-            for p, n in [(r'(\d+)\s*brigada', 'brigadas'), (r'(\d+)\s*helic', 'helicópteros')]:
-                if mr := re.search(p, t): rec.append(f"{mr[1]} {n}")
-            ms = re.search(r'(\d+(?:[.,]\d+)?)\s*(?:hect|ha)', t)
-            sup = f"{ms[1]} ha" if ms else ""
+            region = claves['region'] or "No especificada"
+            mc = COMUNA_RE.search(txt)
+            comuna = mc[1].strip()[:50].title() if mc else "No especificada"
+            causa = claves['causa'] or "Emergencia"
+            rec, sup = {}, ""
+            for mr in CIFRAS_RE.finditer(t):
+                if mr[2] in RECURSOS:  # recursos son enteros: de "1.5 brigadas" vale el 5, como con (\d+)
+                    rec.setdefault(mr[2], f"{re.split('[.,]', mr[1])[-1]} {RECURSOS[mr[2]]}")
+                elif not sup: sup = f"{mr[1]} ha"
+                if sup and len(rec) == len(RECURSOS): break
             return Alerta(id=aid, url=url, tipo=tipo, region=region, comuna=comuna, causa=causa,
-                         fecha=fecha, hora=hora, recursos=", ".join(rec), superficie=sup,
-                         contenido_hash=hashlib.md5(txt[:500].encode()).hexdigest()[:16])
-        except Exception as e: log(f"    ✗ {e}", "WARN"); return None
+                         fecha=fecha, hora=hora, recursos=", ".join(rec[k] for k in RECURSOS if k in rec), superficie=sup,
+                         contenido_hash=hashlib.blake2b(txt[:500].encode(), digest_size=8).hexdigest())
+        except Exception as e: logger.warning("    ✗ %s", e); return None
 
 
-class Dashboard:
-    def generar(self, alertas: List[Alerta], cambios: List[Cambio], ultima_act: str):
-        # Estadísticas
-        stats = {
-            'total': len(alertas), 
-            'rojas': sum(1 for a in alertas if a.tipo == 'roja'),
-            'amarillas': sum(1 for a in alertas if a.tipo == 'amarilla'),
-            'tempranas': sum(1 for a in alertas if a.tipo == 'temprana'), 
-            'ultima_actualizacion': ultima_act,
-            'regiones_afectadas': len(set(a.region for a in alertas))
-        }
-        
-        # Estado por región
-        estado_regiones = {}
-        for region in REGIONES:
-            ar = [a for a in alertas if a.region == region]
-            if not ar: 
-                estado_regiones[region] = {'estado': 'ok', 'total': 0, 'rojas': 0, 'amarillas': 0, 'tempranas': 0}
-            else:
-                r = sum(1 for a in ar if a.tipo == 'roja')
-                am = sum(1 for a in ar if a.tipo == 'amarilla')
-                t = sum(1 for a in ar if a.tipo == 'temprana')
-                estado_regiones[region] = {
-                    'estado': 'roja' if r else ('amarilla' if am else 'temprana'), 
-                    'total': len(ar), 'rojas': r, 'amarillas': am, 'tempranas': t
-                }
-        
-        # Por causa
-        por_causa = {}
-        for a in alertas: 
-            por_causa[a.causa] = por_causa.get(a.causa, 0) + 1
-        
-        # Datos para JS
-        datos = {
-            'alertas': [a.to_dict() for a in alertas], 
-            'cambios': [asdict(c) for c in cambios[-30:]], 
-            'stats': stats, 
-            'estado_regiones': estado_regiones, 
-            'por_causa': por_causa,
-            'regiones': REGIONES,
-            'modo_silencioso': CONFIG["notificaciones"]["modo_silencioso"]["activado"]
-        }
-        
-        with open(CONFIG["archivos"]["datos_js"], 'w', encoding='utf-8') as f:
-            f.write(f"const DATA={json.dumps(datos, ensure_ascii=False)};")
-        
-        self._generar_html()
-        print(f"📊 Dashboard: {CONFIG['archivos']['dashboard']}")
-    
-    def _generar_html(self):
-        html = '''<!DOCTYPE html>
+DASHBOARD_HTML = '''<!DOCTYPE html>
 <html lang="es">
 <head>
     <meta charset="UTF-8">
@@ -765,13 +1060,19 @@ class Dashboard:
     <script src="datos_alertas.js"></script>
     <script>
         let charts = {};
+        const ICONOS = {nueva: '➕', actualizada: '🔄', cancelada: '❌'};
         
         function init() {
             if (typeof DATA === 'undefined') {
                 setTimeout(init, 500);
                 return;
             }
-            
+            Chart.defaults.color = '#8b8d91';
+            Chart.defaults.borderColor = '#2a2e35';
+            render();
+        }
+        
+        function render() {
             // Stats
             document.getElementById('stat-total').textContent = DATA.stats.total;
             document.getElementById('stat-rojas').textContent = DATA.stats.rojas;
@@ -782,24 +1083,8 @@ class Dashboard:
             document.getElementById('alert-count').textContent = DATA.stats.total + ' alertas';
             
             // Alerts table
-            const tbody = document.getElementById('alerts-body');
-            if (DATA.alertas.length === 0) {
-                tbody.innerHTML = '<tr><td colspan="5"><div class="empty-state"><div class="empty-state-icon">✅</div><div>Sin alertas activas</div></div></td></tr>';
-            } else {
-                const sorted = DATA.alertas.sort((a, b) => {
-                    const order = {roja: 0, amarilla: 1, temprana: 2};
-                    return (order[a.tipo] || 3) - (order[b.tipo] || 3);
-                });
-                tbody.innerHTML = sorted.map(a => `
-                    <tr>
-                        <td><span class="badge badge-${a.tipo}">${a.tipo}</span></td>
-                        <td>${a.region}</td>
-                        <td>${a.causa}${a.superficie ? ' <span style="color:var(--text-dim)">(' + a.superficie + ')</span>' : ''}</td>
-                        <td>${a.fecha}</td>
-                        <td><a href="${a.url}" target="_blank" class="link">Ver →</a></td>
-                    </tr>
-                `).join('');
-            }
+            // Filas ya armadas en Python (ordenadas por tipo)
+            document.getElementById('alerts-body').innerHTML = DATA.html_alertas;
             
             // Regions grid
             const rgrid = document.getElementById('regions-grid');
@@ -818,10 +1103,9 @@ class Dashboard:
             if (DATA.cambios.length === 0) {
                 alist.innerHTML = '<div class="empty-state"><div>Sin actividad reciente</div></div>';
             } else {
-                const icons = {nueva: '➕', actualizada: '🔄', cancelada: '❌'};
                 alist.innerHTML = DATA.cambios.slice().reverse().map(c => `
                     <div class="activity-item">
-                        <div class="activity-icon ${c.tipo_cambio}">${icons[c.tipo_cambio] || '•'}</div>
+                        <div class="activity-icon ${c.tipo_cambio}">${ICONOS[c.tipo_cambio] || '•'}</div>
                         <div class="activity-content">
                             <div class="activity-text">${c.descripcion}</div>
                             <div class="activity-time">${c.fecha_hora}</div>
@@ -830,18 +1114,24 @@ class Dashboard:
                 `).join('');
             }
             
-            // Charts
-            Chart.defaults.color = '#8b8d91';
-            Chart.defaults.borderColor = '#2a2e35';
+            // Charts: se crean una vez y luego solo se actualizan sus datos
+            const tipos = [DATA.stats.rojas, DATA.stats.amarillas, DATA.stats.tempranas];
+            if (charts.tipos) {
+                charts.tipos.data.datasets[0].data = tipos;
+                charts.tipos.update('none');
+                charts.causas.data.labels = DATA.causas_etiquetas;
+                charts.causas.data.datasets[0].data = DATA.causas_totales;
+                charts.causas.update('none');
+                return;
+            }
             
             const ctx1 = document.getElementById('chart-tipos').getContext('2d');
-            if (charts.tipos) charts.tipos.destroy();
             charts.tipos = new Chart(ctx1, {
                 type: 'doughnut',
                 data: {
                     labels: ['Rojas', 'Amarillas', 'Tempranas'],
                     datasets: [{
-                        data: [DATA.stats.rojas, DATA.stats.amarillas, DATA.stats.tempranas],
+                        data: tipos,
                         backgroundColor: ['#f2495c', '#fade2a', '#5794f2'],
                         borderWidth: 0
                     }]
@@ -859,14 +1149,12 @@ class Dashboard:
             });
             
             const ctx2 = document.getElementById('chart-causas').getContext('2d');
-            if (charts.causas) charts.causas.destroy();
-            const causas = Object.entries(DATA.por_causa).sort((a, b) => b[1] - a[1]).slice(0, 6);
             charts.causas = new Chart(ctx2, {
                 type: 'bar',
                 data: {
-                    labels: causas.map(c => c[0].length > 15 ? c[0].substring(0, 15) + '...' : c[0]),
+                    labels: DATA.causas_etiquetas,  // top 6 ya ordenado y con etiquetas recortadas
                     datasets: [{
-                        data: causas.map(c => c[1]),
+                        data: DATA.causas_totales,
                         backgroundColor: ['#f2495c', '#ff9830', '#fade2a', '#73bf69', '#5794f2', '#b877d9'],
                         borderWidth: 0
                     }]
@@ -884,25 +1172,162 @@ class Dashboard:
             });
         }
         
-        // Countdown
-        let count = 30;
-        setInterval(() => {
-            count--;
-            document.getElementById('countdown').textContent = count;
-            if (count <= 0) {
-                count = 30;
-                location.reload();
+        // Recarga solo datos_alertas.js (un <script> nuevo también funciona abriendo el archivo local, donde fetch no)
+        function recargarDatos() {
+            const s = document.createElement('script');
+            s.src = 'datos_alertas.js?t=' + Date.now();
+            s.onload = () => { s.remove(); render(); };
+            s.onerror = () => s.remove();
+            document.head.appendChild(s);
+        }
+        
+        // Refresco con setTimeout encadenado; el contador solo se repinta con la pestaña visible
+        const REFRESCO = 30000;
+        let proximo = Date.now() + REFRESCO, reloj = null;
+        function refrescar() {
+            recargarDatos();
+            proximo = Date.now() + REFRESCO;
+            setTimeout(refrescar, REFRESCO);
+        }
+        function pintarContador() {
+            document.getElementById('countdown').textContent = Math.max(0, Math.round((proximo - Date.now()) / 1000));
+        }
+        function contador() {
+            clearInterval(reloj);
+            reloj = null;
+            if (!document.hidden) {
+                pintarContador();
+                reloj = setInterval(pintarContador, 1000);
             }
-        }, 1000);
+        }
+        document.addEventListener('visibilitychange', contador);
+        setTimeout(refrescar, REFRESCO);
+        contador();
         
         init();
     </script>
 </body>
 </html>'''
+DASHBOARD_HTML_BYTES = DASHBOARD_HTML.encode('utf-8')
+
+FILA_VACIA = '<tr><td colspan="5"><div class="empty-state"><div class="empty-state-icon">✅</div><div>Sin alertas activas</div></div></td></tr>'
+
+def filas_alertas(alertas: List[Alerta]) -> str:
+    # Filas de la tabla del dashboard: el navegador solo asigna innerHTML (los textos vienen del sitio, se escapan)
+    if not alertas: return FILA_VACIA
+    partes = []
+    for a in alertas:
+        tipo = escape(a.tipo)
+        sup = f' <span style="color:var(--text-dim)">({escape(a.superficie)})</span>' if a.superficie else ''
+        partes.append(f'<tr><td><span class="badge badge-{tipo}">{tipo}</span></td><td>{escape(a.region)}</td><td>{escape(a.causa)}{sup}</td>'
+                      f'<td>{escape(a.fecha)}</td><td><a href="{escape(a.url, quote=True)}" target="_blank" class="link">Ver →</a></td></tr>')
+    return "".join(partes)
+
+
+class Dashboard:
+    def __init__(self):
+        self._html_escrito: Optional[Path] = None
+        self._firma: Optional[bytes] = None
+        self._datos = b""
+    
+    def generar(self, alertas: List[Alerta], cambios: List[Cambio], ultima_act: str, firma: bytes = None):
+        """firma: huella del estado del Monitor; si no cambió se reutilizan los datos ya serializados
+        y solo se reescribe la hora de actualización."""
+        if firma is None or firma != self._firma:
+            self._datos = self._serializar(alertas, cambios)
+            self._firma = firma
+        
+        ruta = CONFIG["archivos"]["datos_js"]
+        hora = f';DATA.stats.ultima_actualizacion="{ultima_act}";'.encode()
+        with abrir_atomico(ruta) as f:
+            f.write(b"var DATA=")  # var: se vuelve a declarar en cada recarga del script
+            f.write(self._datos)
+            f.write(hora)
+        if CONFIG["archivos"]["gzip"]:  # copia .gz para servidores web que entregan archivos precomprimidos
+            with abrir_atomico(f"{ruta}.gz") as f, gzip.GzipFile(fileobj=f, mode='wb', compresslevel=6, mtime=0) as g:
+                g.write(b"var DATA="); g.write(self._datos); g.write(hora)
+        
+        self._generar_html()
+        print(f"📊 Dashboard: {CONFIG['archivos']['dashboard']}")
+    
+    def _serializar(self, alertas: List[Alerta], cambios: List[Cambio]) -> bytes:
+        alertas = sorted(alertas, key=lambda a: TIPO_RANK.get(a.tipo, 2))  # roja, amarilla, temprana
+        # Conteos en una sola pasada
+        por_tipo, por_causa, por_region = Counter(), Counter(), defaultdict(Counter)
+        for a in alertas:
+            por_tipo[a.tipo] += 1
+            por_causa[a.causa] += 1
+            por_region[a.region][a.tipo] += 1
+        
+        # Estadísticas
+        stats = {
+            'total': len(alertas), 
+            'rojas': por_tipo['roja'],
+            'amarillas': por_tipo['amarilla'],
+            'tempranas': por_tipo['temprana'], 
+            'regiones_afectadas': len(por_region)
+        }
+        
+        # Estado por región
+        estado_regiones = {}
+        for region in REGIONES:
+            c = por_region.get(region)
+            if not c: 
+                estado_regiones[region] = {'estado': 'ok', 'total': 0, 'rojas': 0, 'amarillas': 0, 'tempranas': 0}
+            else:
+                r, am, t = c['roja'], c['amarilla'], c['temprana']
+                estado_regiones[region] = {
+                    'estado': 'roja' if r else ('amarilla' if am else 'temprana'), 
+                    'total': sum(c.values()), 'rojas': r, 'amarillas': am, 'tempranas': t
+                }
+        
+        # Datos para JS
+        top = [k for k, _ in por_causa.most_common(6)]
+        datos = {
+            'html_alertas': filas_alertas(alertas),  # la tabla ya armada; la lista de alertas no se repite aparte
+            'cambios': cambios[-30:], 
+            'stats': stats, 
+            'estado_regiones': estado_regiones, 
+            'causas_etiquetas': [k if len(k) <= 15 else k[:15] + '...' for k in top],  # gráfico de causas, listas paralelas
+            'causas_totales': [por_causa[k] for k in top],
+            'regiones': REGIONES,
+            'modo_silencioso': CONFIG["notificaciones"]["modo_silencioso"]["activado"]
+        }
         
-        with open(CONFIG["archivos"]["dashboard"], 'w', encoding='utf-8') as f:
-            f.write(html)
+        b = io.BytesIO()
+        escribir_json(b, datos)
+        return b.getvalue()
+    
+    def _generar_html(self):
+        # La plantilla es estática: solo se escribe si falta o cambió (los datos van en datos_js)
+        p = Path(CONFIG["archivos"]["dashboard"])
+        if self._html_escrito == p and p.exists(): return
+        if not (p.exists() and p.read_bytes() == DASHBOARD_HTML_BYTES):
+            with abrir_atomico(p) as f: f.write(DASHBOARD_HTML_BYTES)
+        self._html_escrito = p
+
 
+# CSS fijo del resumen diario (se arma una vez por proceso)
+RESUMEN_CSS = '''<style>
+body { font-family: -apple-system, sans-serif; max-width: 800px; margin: 0 auto; padding: 20px; background: #f5f5f5; }
+.header { background: #1a1a2e; color: #fff; padding: 24px; border-radius: 8px; margin-bottom: 20px; }
+.header h1 { margin: 0 0 8px 0; }
+.stats { display: grid; grid-template-columns: repeat(4, 1fr); gap: 12px; margin-bottom: 20px; }
+.stat { background: #fff; padding: 16px; border-radius: 8px; text-align: center; }
+.stat-num { font-size: 28px; font-weight: 700; }
+.stat-num.r { color: #f2495c; }
+.stat-num.a { color: #fade2a; }
+.stat-num.t { color: #5794f2; }
+.section { background: #fff; padding: 16px; border-radius: 8px; margin-bottom: 16px; }
+.section h2 { margin: 0 0 12px 0; font-size: 16px; }
+table { width: 100%; border-collapse: collapse; }
+th, td { padding: 10px; text-align: left; border-bottom: 1px solid #eee; }
+th { background: #f8f9fa; font-size: 12px; text-transform: uppercase; }
+.badge { padding: 3px 8px; border-radius: 4px; font-size: 11px; font-weight: 600; }
+.badge.roja { background: #f2495c; color: #fff; }
+.badge.amarilla { background: #fade2a; }
+.badge.temprana { background: #5794f2; color: #fff; }
+</style>'''
 
 class ResumenDiario:
     def __init__(self, alertas, cambios):
@@ -913,34 +1338,15 @@ class ResumenDiario:
     def generar(self):
         if not CONFIG["resumen_diario"]["activado"]: return
         fn = f"{CONFIG['archivos']['resumen']}_{self.fecha}.html"
-        r = sum(1 for a in self.alertas if a.tipo=='roja')
-        am = sum(1 for a in self.alertas if a.tipo=='amarilla')
-        t = sum(1 for a in self.alertas if a.tipo=='temprana')
+        por_tipo = Counter(a.tipo for a in self.alertas)
+        r, am, t = por_tipo['roja'], por_tipo['amarilla'], por_tipo['temprana']
         hoy = datetime.now().strftime("%d/%m/%Y")
         ch = [c for c in self.cambios if hoy in c.fecha_hora]
         
-        html = f'''<!DOCTYPE html>
-<html><head><meta charset="UTF-8"><title>Resumen {self.fecha}</title>
-<style>
-body {{ font-family: -apple-system, sans-serif; max-width: 800px; margin: 0 auto; padding: 20px; background: #f5f5f5; }}
-.header {{ background: #1a1a2e; color: #fff; padding: 24px; border-radius: 8px; margin-bottom: 20px; }}
-.header h1 {{ margin: 0 0 8px 0; }}
-.stats {{ display: grid; grid-template-columns: repeat(4, 1fr); gap: 12px; margin-bottom: 20px; }}
-.stat {{ background: #fff; padding: 16px; border-radius: 8px; text-align: center; }}
-.stat-num {{ font-size: 28px; font-weight: 700; }}
-.stat-num.r {{ color: #f2495c; }}
-.stat-num.a {{ color: #fade2a; }}
-.stat-num.t {{ color: #5794f2; }}
-.section {{ background: #fff; padding: 16px; border-radius: 8px; margin-bottom: 16px; }}
-.section h2 {{ margin: 0 0 12px 0; font-size: 16px; }}
-table {{ width: 100%; border-collapse: collapse; }}
-th, td {{ padding: 10px; text-align: left; border-bottom: 1px solid #eee; }}
-th {{ background: #f8f9fa; font-size: 12px; text-transform: uppercase; }}
-.badge {{ padding: 3px 8px; border-radius: 4px; font-size: 11px; font-weight: 600; }}
-.badge.roja {{ background: #f2495c; color: #fff; }}
-.badge.amarilla {{ background: #fade2a; }}
-.badge.temprana {{ background: #5794f2; color: #fff; }}
-</style></head>
+        with open(fn, 'w', encoding='utf-8') as f:
+            f.write(f'<!DOCTYPE html>\n<html><head><meta charset="UTF-8"><title>Resumen {self.fecha}</title>\n')
+            f.write(RESUMEN_CSS)
+            f.write(f'''</head>
 <body>
 <div class="header">
     <h1>📊 Resumen Diario SENAPRED</h1>
@@ -956,22 +1362,26 @@ th {{ background: #f8f9fa; font-size: 12px; text-transform: uppercase; }}
     <h2>Alertas Activas</h2>
     <table>
         <tr><th>Tipo</th><th>Región</th><th>Causa</th><th>Fecha</th></tr>
-        {''.join(f'<tr><td><span class="badge {a.tipo}">{a.tipo.upper()}</span></td><td>{a.region}</td><td>{a.causa}</td><td>{a.fecha}</td></tr>' for a in self.alertas) or '<tr><td colspan="4" style="text-align:center;color:#888;">Sin alertas</td></tr>'}
+        ''')
+            # Filas escritas directo al archivo (buffer de E/S), sin armar el documento en memoria
+            f.writelines(f'<tr><td><span class="badge {a.tipo}">{a.tipo.upper()}</span></td><td>{a.region}</td><td>{a.causa}</td><td>{a.fecha}</td></tr>' for a in self.alertas)
+            if not self.alertas: f.write('<tr><td colspan="4" style="text-align:center;color:#888;">Sin alertas</td></tr>')
+            f.write(f'''
     </table>
 </div>
 <div class="section">
     <h2>Cambios del Día ({len(ch)})</h2>
     <table>
         <tr><th>Tipo</th><th>Hora</th><th>Descripción</th></tr>
-        {''.join(f'<tr><td>{c.tipo_cambio}</td><td>{c.fecha_hora}</td><td>{c.descripcion}</td></tr>' for c in ch) or '<tr><td colspan="3" style="text-align:center;color:#888;">Sin cambios</td></tr>'}
+        ''')
+            f.writelines(f'<tr><td>{c.tipo_cambio}</td><td>{c.fecha_hora}</td><td>{c.descripcion}</td></tr>' for c in ch)
+            if not ch: f.write('<tr><td colspan="3" style="text-align:center;color:#888;">Sin cambios</td></tr>')
+            f.write('''
     </table>
 </div>
 <p style="text-align:center;color:#888;font-size:12px;">Monitor SENAPRED v6.1</p>
-</body></html>'''
-        
-        with open(fn, 'w', encoding='utf-8') as f: 
-            f.write(html)
-        log(f"📋 Resumen: {fn}")
+</body></html>''')
+        logger.info("📋 Resumen: %s", fn)
 
 
 class Monitor:
@@ -982,9 +1392,13 @@ class Monitor:
         self.scraper = Scraper(self.dias_max)
         self.dashboard = Dashboard()
         self.alertas: Dict[str, Alerta] = {}
-        self.cambios: List[Cambio] = []
+        self.cambios: deque = deque(maxlen=CAMBIOS_MAX)
         self.ultimo_resumen = None
         self._cargar()
+        self._activas: Dict[str, Alerta] = {id: a for id, a in self.alertas.items() if a.estado_monitor != "cancelada"}
+        self._io = ThreadPoolExecutor(max_workers=1)  # escritura de estado y dashboard en segundo plano
+        self._firma_guardada = self._firma()  # el archivo de estado recién cargado ya coincide
+        self._despertar: Optional[int] = None  # lectura del pipe donde SIGUSR1 avisa (adelanta la próxima consulta)
     
     def _cargar(self):
         try:
@@ -992,25 +1406,62 @@ class Monitor:
             if Path(ef).exists():
                 with open(ef, 'r', encoding='utf-8') as f:
                     d = json.load(f)
+                    legado = d.get('hash_v') != HASH_V  # ids o hashes de versiones anteriores
+                    ids = {}
                     for a in d.get('alertas', []): 
+                        nid = generar_id(a['url'])
+                        ids[a['id']], a['id'] = nid, nid  # id guardado -> id actual
+                        if legado: a['contenido_hash'] = ''  # el primer ciclo adopta el hash nuevo sin avisar
                         self.alertas[a['id']] = Alerta(**a)
                     for c in d.get('cambios', []): 
+                        c['alerta_id'] = ids.get(c['alerta_id'], c['alerta_id'])
                         self.cambios.append(Cambio(**c))
-                log(f"Cargado: {len(self.alertas)} alertas")
+                    # Con hashes legados no se usa la caché: un 304 devolvería la alerta sin hash nuevo
+                    # Las negativas vuelven como None; las positivas solo si su alerta sigue activa (sin campos viejos)
+                    for u, (etag, modificado, *negativa) in ({} if legado else d.get('cache_http', {})).items():
+                        if not negativa: continue  # guardada sin la marca: no se sabe si era negativa
+                        if negativa[0]: self.scraper.cache_http[u] = (etag, modificado, None)
+                        elif (a := self.alertas.get(generar_id(u))) and a.estado_monitor != "cancelada":
+                            self.scraper.cache_http[u] = (etag, modificado, a)
+                logger.info("Cargado: %s alertas", len(self.alertas))
         except: pass
     
-    def _guardar(self):
+    def _estado(self) -> dict:
+        """Copia del estado a persistir, para poder escribirla fuera del hilo principal."""
+        return {
+            'hash_v': HASH_V,
+            'alertas': [campos(a) for a in self.alertas.values()],  # copia de campos: el hilo principal modifica las Alerta
+            'cambios': ultimos(self.cambios, 100),
+            'cache_http': {u: [c[0], c[1], c[2] is None] for u, c in self.scraper.cache_http.items()}  # True: caché negativa
+        }
+    
+    def _firma(self) -> bytes:
+        """Huella barata de lo que se persiste; si no cambió desde la última escritura, no se reescribe el estado."""
+        h = hashlib.blake2b(digest_size=8)
+        for a in self.alertas.values(): h.update(f'{a.id}:{a.contenido_hash}:{a.estado_monitor}\n'.encode())
+        for u, (etag, modificado, a) in self.scraper.cache_http.items(): h.update(f'{u}:{etag}:{modificado}:{a is None}\n'.encode())
+        h.update(f'{len(self.cambios)}:{self.cambios[-1] if self.cambios else ""}'.encode())  # len se estanca al llenarse el deque
+        return h.digest()
+    
+    def _guardar(self, estado: dict = None) -> bool:
         try:
-            with open(CONFIG["archivos"]["estado"], 'w', encoding='utf-8') as f:
-                json.dump({
-                    'alertas': [a.to_dict() for a in self.alertas.values()], 
-                    'cambios': [asdict(c) for c in self.cambios[-100:]]
-                }, f, ensure_ascii=False)
-        except: pass
+            with abrir_atomico(CONFIG["archivos"]["estado"]) as f:
+                escribir_json(f, estado or self._estado())
+            return True
+        except Exception as e:
+            logger.error("Error guardando estado: %s", e)
+            return False
     
-    def _detectar_cambios(self, nuevas):
+    def _persistir(self, estado: dict, activas: List[Alerta], cambios: List[Cambio], ultima_act: str, firma: bytes):
+        try:
+            # La firma se da por guardada solo si la escritura funcionó; si falló, el próximo ciclo reintenta
+            if estado and self._guardar(estado): self._firma_guardada = firma
+            self.dashboard.generar(activas, cambios, ultima_act, firma)
+        except Exception as e: logger.error("Error guardando: %s", e)
+    
+    def _detectar_cambios(self, nuevas, ahora: str = None):
         n, u, c = [], [], []
-        ahora = datetime.now().strftime("%d/%m/%Y %H:%M")
+        ahora = ahora or datetime.now().strftime("%d/%m/%Y %H:%M")
         ids = {a.id for a in nuevas}
         
         for a in nuevas:
@@ -1018,34 +1469,53 @@ class Monitor:
                 n.append(a)
                 self.alertas[a.id] = a
                 self.cambios.append(Cambio(a.id, "nueva", ahora, f"{a.tipo.upper()}: {a.region} - {a.causa}"))
-            elif a.contenido_hash != self.alertas[a.id].contenido_hash:
+            elif a.contenido_hash != (v := self.alertas[a.id]).contenido_hash:
+                # Estado legado (HASH_V): una activa adopta el hash nuevo sin avisar; una cancelada que reaparece se reactiva
+                if not v.contenido_hash and v.estado_monitor != "cancelada": v.contenido_hash = a.contenido_hash; continue
                 u.append(a)
                 self.alertas[a.id] = a
                 self.cambios.append(Cambio(a.id, "actualizada", ahora, f"{a.tipo.upper()}: {a.region}"))
-        
-        for id in list(self.alertas.keys()):
-            if id not in ids and self.alertas[id].estado_monitor != "cancelada":
-                self.alertas[id].estado_monitor = "cancelada"
-                c.append(self.alertas[id])
-                self.cambios.append(Cambio(id, "cancelada", ahora, f"{self.alertas[id].tipo.upper()}: {self.alertas[id].region}"))
+            else: continue
+            if a.estado_monitor != "cancelada": self._activas[a.id] = a
+        
+        # Solo las activas que ya no aparecen; el historial cancelado no se recorre.
+        # Con un listado incompleto las ausentes quedan sin revisar: darlas por canceladas las haría ir y volver
+        sin_revisar = self.scraper.sin_revisar if self.scraper.listado_completo else self._activas.keys()
+        for id in self._activas.keys() - ids - sin_revisar:
+            a = self._activas.pop(id)
+            a.estado_monitor = "cancelada"
+            c.append(a)
+            self.cambios.append(Cambio(id, "cancelada", ahora, f"{a.tipo.upper()}: {a.region}"))
         
         return n, u, c
     
-    def _check_resumen(self):
+    def _check_resumen(self, ahora: datetime = None):
         if not CONFIG["resumen_diario"]["activado"]: return
         try:
             hg = CONFIG["resumen_diario"]["hora_generacion"]
-            ahora = datetime.now()
+            ahora = ahora or datetime.now()
             ho = datetime.strptime(hg, "%H:%M").time()
             if self.ultimo_resumen == ahora.date(): return
             if ahora.time() >= ho:
-                act = [a for a in self.alertas.values() if a.estado_monitor != 'cancelada']
+                act = list(self._activas.values())
                 ResumenDiario(act, self.cambios).generar()
                 self.ultimo_resumen = ahora.date()
         except: pass
     
+    def _esperar(self):
+        """Espera el intervalo o hasta recibir SIGUSR1 (en Windows no hay señal: time.sleep)."""
+        if self._despertar is None: time.sleep(self.intervalo); return
+        if select.select([self._despertar], [], [], self.intervalo)[0]: os.read(self._despertar, 512)  # descarta los avisos
+    
     def ejecutar(self):
-        os.system('cls' if sys.platform == 'win32' else 'clear')
+        limpiar_pantalla()
+        if hasattr(signal, 'SIGUSR1'):
+            # El manejador no toca locks (un Event se trabaría si la señal llega mientras el hilo principal lo usa):
+            # set_wakeup_fd escribe un byte en el pipe y _esperar lo ve con select
+            self._despertar, w = os.pipe()
+            os.set_blocking(w, False)
+            signal.set_wakeup_fd(w)
+            signal.signal(signal.SIGUSR1, lambda *_: None)
         sil = ""
         if CONFIG["notificaciones"]["modo_silencioso"]["activado"]:
             ms = CONFIG["notificaciones"]["modo_silencioso"]
@@ -1060,22 +1530,28 @@ class Monitor:
   📊 Dashboard: {CONFIG['archivos']['dashboard']}
         ''')
         
-        act = [a for a in self.alertas.values() if a.estado_monitor != 'cancelada']
-        self.dashboard.generar(act, self.cambios, datetime.now().strftime("%d/%m/%Y %H:%M"))
+        act = list(self._activas.values())
+        self.dashboard.generar(act, ultimos(self.cambios, 30), datetime.now().strftime("%d/%m/%Y %H:%M"), self._firma_guardada)
         
         while True:
             try:
-                self._check_resumen()
-                st = " 🔇" if en_horario_silencioso() else ""
-                print(f"\n🔄 Consultando...{st} [{datetime.now().strftime('%H:%M:%S')}]")
+                inicio = datetime.now()
+                self._check_resumen(inicio)
+                st = " 🔇" if en_horario_silencioso(inicio) else ""
+                print(f"\n🔄 Consultando...{st} [{inicio.strftime('%H:%M:%S')}]")
                 
                 alertas = self.scraper.obtener_alertas()
-                n, u, c = self._detectar_cambios(alertas)
+                fin = datetime.now().strftime("%d/%m/%Y %H:%M")  # hora de los cambios y del dashboard, tras el scraping
+                n, u, c = self._detectar_cambios(alertas, fin)
+                act = list(self._activas.values())
+                firma = self._firma()
+                estado = self._estado() if firma != self._firma_guardada else None  # None: sin cambios, no se reescribe
+                self._io.submit(self._persistir, estado, act, ultimos(self.cambios, 30), fin, firma)
                 
                 if n:
                     print(f"🆕 {len(n)} NUEVA(S)")
                     for a in n: 
-                        print(f"   {'🔴' if a.tipo=='roja' else '🟡' if a.tipo=='amarilla' else '🔵'} {a.region} - {a.causa}")
+                        print(f"   {TIPO_ICONO.get(a.tipo, '🔵')} {a.region} - {a.causa}")
                     if self.con_sonido: sonido("nueva")
                     for a in n: 
                         notificar(f"🆕 {a.tipo.upper()}", f"{a.region}\n{a.causa}", a.tipo=='roja')
@@ -1091,20 +1567,18 @@ class Monitor:
                 if not n and not u and not c: 
                     print("✓ Sin cambios")
                 
-                self._guardar()
-                act = [a for a in self.alertas.values() if a.estado_monitor != 'cancelada']
-                self.dashboard.generar(act, self.cambios, datetime.now().strftime("%d/%m/%Y %H:%M"))
-                
                 print(f"📋 Total: {len(act)} alertas activas")
                 print(f"⏳ Próxima consulta en {self.intervalo//60} min...")
-                time.sleep(self.intervalo)
+                self._esperar()
                 
             except KeyboardInterrupt: 
                 print("\n👋 Monitor detenido")
+                self._io.shutdown(wait=True)
                 self._guardar()
+                self.scraper.close()
                 break
             except Exception as e: 
-                log(f"Error: {e}", "ERROR")
+                logger.error("Error: %s", e)
                 time.sleep(60)
 
 
@@ -1118,10 +1592,6 @@ def main():
     p.add_argument('--config', '-c', action='store_true', help='Ver configuración')
     args = p.parse_args()
     
-    if not SELENIUM_OK or not BS4_OK: 
-        print("❌ Instalar: pip install selenium webdriver-manager beautifulsoup4 plyer")
-        return
-    
     if args.config: 
         print(json.dumps(CONFIG, ensure_ascii=False, indent=2))
         return
@@ -1137,6 +1607,11 @@ def main():
             print(f"Error: {e}")
         return
     
+    # --config y --resumen no necesitan selenium; aquí se importa y se verifica que funcione
+    if not cargar_selenium() or not (LXML_OK or BS4_OK): 
+        print("❌ Instalar: pip install selenium webdriver-manager beautifulsoup4 lxml plyer")
+        return
+    
     if args.sound: 
         CONFIG["notificaciones"]["sonido_activado"] = True
     
@@ -1145,14 +1620,15 @@ def main():
     else:
         dias = args.dias or CONFIG['general']['dias_antiguedad']
         print(f"\n🔍 Consultando SENAPRED (últimos {dias} días)...\n")
-        alertas = Scraper(dias).obtener_alertas()
+        with Scraper(dias) as scraper:
+            alertas = scraper.obtener_alertas()
         
         print(f"\n{'═'*60}")
         print(f"  ⚡ {len(alertas)} ALERTAS ENCONTRADAS")
         print(f"{'═'*60}\n")
         
-        for a in sorted(alertas, key=lambda x: (0 if x.tipo=='roja' else 1 if x.tipo=='amarilla' else 2)):
-            icon = '🔴' if a.tipo=='roja' else '🟡' if a.tipo=='amarilla' else '🔵'
+        for a in sorted(alertas, key=lambda x: TIPO_RANK.get(x.tipo, 2)):
+            icon = TIPO_ICONO.get(a.tipo, '🔵')
             print(f"{icon} [{a.tipo.upper():8}] {a.region}")
             print(f"   📅 {a.fecha} | ⚠️  {a.causa}")
             if a.superficie: